@@ -1,10 +1,219 @@
+import sys
 import traceback
-from typing import Any, TypeVar, overload
+from typing import Any, NoReturn, TypeVar, overload
 from collections.abc import Callable
 
 
 T = TypeVar('T')
 
+# Class attribute recording whether the class was decorated with debug=True
+_DEBUG_ATTR = '_lazy_freeze_debug'
+
+# Instance __dict__ key holding the hash cached when an object is frozen
+_HASH_CACHE_ATTR = '_lazy_freeze_hash'
+
+
+class _HashStackTrace:
+    """Stack recorded when a hash was taken (debug mode), formatted only if it is ever reported."""
+    __slots__ = ('_stack', '_formatted')
+
+    def __init__(self, frame: Any) -> None:
+        # Frame positions must be recorded now, but reading source lines and formatting can wait
+        self._stack = traceback.StackSummary.extract(traceback.walk_stack(frame), lookup_lines=False)
+        self._stack.reverse()
+        self._formatted: str | None = None
+
+    def __str__(self) -> str:
+        if self._formatted is None:
+            self._formatted = ''.join(self._stack.format())
+        return self._formatted
+
+
+# Messages for in-place operations, protected only if the class supports them
+_INPLACE_OPS = {
+    '__iadd__': "modify with in-place addition",
+    '__isub__': "modify with in-place subtraction",
+    '__imul__': "modify with in-place multiplication",
+    '__itruediv__': "modify with in-place division",
+    '__ifloordiv__': "modify with in-place floor division",
+    '__imod__': "modify with in-place modulo",
+    '__ipow__': "modify with in-place power",
+    '__ilshift__': "modify with in-place left shift",
+    '__irshift__': "modify with in-place right shift",
+    '__iand__': "modify with in-place bitwise AND",
+    '__ixor__': "modify with in-place bitwise XOR",
+    '__ior__': "modify with in-place bitwise OR",
+
+    # numpy-specific (operator '@'), but added for completeness
+    '__imatmul__': "modify with in-place matrix multiplication",
+}
+
+
+def _error_message(self: Any, operation: str) -> str:
+    """Message for a rejected mutation, with the stack trace of the hash in debug mode."""
+    message = f"Cannot {operation} {type(self).__name__} after its hash has been taken"
+    if not getattr(type(self), _DEBUG_ATTR):
+        return message
+    # Read from the __dict__, where __hash__ stored it, so a user __getattr__ never runs here
+    stack_trace = self.__dict__.get('_hash_stack_trace')
+    if stack_trace is None:
+        return message
+    return f"{message}.\nHash was calculated at:\n{stack_trace}"
+
+
+def _reject(self: Any, operation: str) -> NoReturn:
+    raise TypeError(_error_message(self, operation))
+
+
+# Guards replacing the mutating methods of a decorated class. Each checks the hash_taken flag
+# and otherwise delegates to the original method. Per-class values are bound as keyword-only
+# default arguments, making them fast locals, and signatures match the special method replaced,
+# since these are never called with keyword arguments.
+
+def _guard_setattr(self: Any, name: str, value: Any, *,
+                   _object_setattr: Callable[..., None] = object.__setattr__) -> None:
+    """__setattr__ shared by all decorated classes that don't customize it and don't set freeze_attrs."""
+    if self.hash_taken:
+        _reject(self, f"modify attribute '{name}' of")
+    _object_setattr(self, name, value)
+
+
+def _guard_delattr(self: Any, name: str, *, _object_delattr: Callable[..., None] = object.__delattr__) -> None:
+    """__delattr__ shared by all decorated classes that don't customize it and don't set freeze_attrs."""
+    if self.hash_taken:
+        _reject(self, f"delete attribute '{name}' from")
+    _object_delattr(self, name)
+
+
+def _make_setattr_guard(original: Callable[..., Any],
+                        protected: frozenset[str] | None) -> Callable[..., None]:
+    """__setattr__ that rejects changes after the hash, only to `protected` attributes if given."""
+    if protected is None:
+        if original is object.__setattr__:
+            return _guard_setattr
+
+        def guarded_setattr(self: Any, name: str, value: Any, *,
+                            _original: Callable[..., Any] = original) -> None:
+            if self.hash_taken:
+                _reject(self, f"modify attribute '{name}' of")
+            _original(self, name, value)
+
+        return guarded_setattr
+
+    def selective_setattr(self: Any, name: str, value: Any, *, _original: Callable[..., Any] = original,
+                          _protected: frozenset[str] = protected) -> None:
+        if self.hash_taken and name in _protected:
+            _reject(self, f"modify attribute '{name}' of")
+        _original(self, name, value)
+
+    return selective_setattr
+
+
+def _make_delattr_guard(original: Callable[..., Any],
+                        protected: frozenset[str] | None) -> Callable[..., None]:
+    """__delattr__ that rejects deletion after the hash, only of `protected` attributes if given."""
+    if protected is None:
+        if original is object.__delattr__:
+            return _guard_delattr
+
+        def guarded_delattr(self: Any, name: str, *, _original: Callable[..., Any] = original) -> None:
+            if self.hash_taken:
+                _reject(self, f"delete attribute '{name}' from")
+            _original(self, name)
+
+        return guarded_delattr
+
+    def selective_delattr(self: Any, name: str, *, _original: Callable[..., Any] = original,
+                          _protected: frozenset[str] = protected) -> None:
+        if self.hash_taken and name in _protected:
+            _reject(self, f"delete attribute '{name}' from")
+        _original(self, name)
+
+    return selective_delattr
+
+
+def _make_setitem_guard(original: Callable[..., Any]) -> Callable[..., Any]:
+    def guarded_setitem(self: Any, key: Any, value: Any, *, _original: Callable[..., Any] = original) -> Any:
+        if self.hash_taken:
+            _reject(self, f"modify item '{key}' of")
+        return _original(self, key, value)
+
+    return guarded_setitem
+
+
+def _make_delitem_guard(original: Callable[..., Any]) -> Callable[..., Any]:
+    def guarded_delitem(self: Any, key: Any, *, _original: Callable[..., Any] = original) -> Any:
+        if self.hash_taken:
+            _reject(self, f"delete item '{key}' from")
+        return _original(self, key)
+
+    return guarded_delitem
+
+
+def _make_inplace_guard(original: Callable[..., Any], operation: str) -> Callable[..., Any]:
+    def guarded_inplace(self: Any, other: Any, *, _original: Callable[..., Any] = original,
+                        _operation: str = operation) -> Any:
+        if self.hash_taken:
+            _reject(self, _operation)
+        return _original(self, other)
+
+    return guarded_inplace
+
+
+def _make_setstate(original: Callable[..., Any] | None) -> Callable[..., None]:
+    """
+    __setstate__ for copy and pickle that restores the state while the new object is still unfrozen,
+    with the class's own __setstate__ if it has one, and freezes it afterwards if the source was frozen.
+    The cached hash is left out, since it may depend on the identity of members that the new object
+    holds copies of, or on another process's str hash salt.
+    """
+    def restoring_setstate(self: Any, state: Any, *, _original: Callable[..., Any] | None = original) -> None:
+        # Default state is the instance __dict__, or a (__dict__, slots) pair for classes that also have slots
+        dict_state, slot_state = state if isinstance(state, tuple) and len(state) == 2 else (state, None)
+        frozen = isinstance(dict_state, dict) and dict_state.get('hash_taken', False)
+        if frozen:
+            dict_state = {name: value for name, value in dict_state.items()
+                          if name != 'hash_taken' and name != _HASH_CACHE_ATTR}
+            state = dict_state if slot_state is None else (dict_state, slot_state)
+
+        if _original is not None:
+            _original(self, state)
+        else:
+            # What pickle and copy do by default
+            if dict_state:
+                self.__dict__.update(dict_state)
+            if slot_state:
+                for name, value in slot_state.items():
+                    setattr(self, name, value)
+
+        if frozen:
+            self.__dict__['hash_taken'] = True
+
+    return restoring_setstate
+
+
+def _rebuild_with_items(factory: Callable[..., Any], args: tuple[Any, ...], items: list[tuple[Any, Any]]) -> Any:
+    """Create a copied or unpickled object and restore its items, before its state freezes it."""
+    obj = factory(*args)
+    for key, value in items:
+        obj[key] = value
+    return obj
+
+
+def _make_reduce_ex(original: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    __reduce_ex__ for classes with items, such as dict subclasses. copy restores the items after the state,
+    so for a frozen object it moves them into the call that creates the copy.
+    """
+    def reordering_reduce_ex(self: Any, protocol: int, *, _original: Callable[..., Any] = original) -> Any:
+        reduced = _original(self, protocol)
+        if not self.hash_taken or isinstance(reduced, str) or len(reduced) < 5 or reduced[4] is None:
+            return reduced
+        factory, args, state, list_items, dict_items = reduced[:5]
+        return (_rebuild_with_items, (factory, args, list(dict_items)), state, list_items, None, *reduced[5:])
+
+    return reordering_reduce_ex
+
 
 @overload
 def lazy_freeze(
@@ -29,13 +238,18 @@ def lazy_freeze(
 ) -> type[T] | Callable[[type[T]], type[T]]:
     """
     Class decorator that makes an object immutable after its hash is calculated.
-    Works only on classes, and furthermore: classes that implement or inherit __hash__.
+    Works only on classes, and furthermore: classes that implement or inherit __hash__,
+    and whose instances have a __dict__ (a class with __slots__ must include '__dict__' in them).
 
     The decorator overrides:
-    - __hash__: to set hash_taken=True when called
+    - __hash__: to set hash_taken=True when called (the class-level default is False),
+                and cache the hash value, which can't change once the object is frozen
     - __setattr__, __delattr__: to prevent attribute modification if hash_taken is True
+    - __setstate__: to restore copied and unpickled objects before freezing them,
+                    and have them calculate their own hash rather than reuse the cached one
     And if existing, also overrides:
     - __setitem__, __delitem__: to prevent item modification if hash_taken is True
+    - __reduce_ex__, for classes with __setitem__: so that copies get their items before they are frozen
     - In-place operations (__iadd__, __isub__, etc.): to prevent in-place modifications
 
     Optional decorator parameters:
@@ -48,109 +262,67 @@ def lazy_freeze(
             raise TypeError(f"@lazy_freeze can only be applied to classes. "
                             f"Got {cls} which is of type '{type(cls).__name__}'.")
 
-        has_custom_hash = hasattr(cls, '__hash__') and cls.__hash__ is not object.__hash__
+        # Looked up through the MRO, so a custom __hash__ inherited from a base class counts.
+        # __hash__ = None marks an unhashable class, e.g. one that defines __eq__ without __hash__.
+        original_hash = cls.__hash__
+        has_custom_hash = original_hash is not None and original_hash is not object.__hash__
         assert has_custom_hash, (
             f"Class '{cls.__name__}' must implement __hash__ to use the @lazy_freeze decorator. "
             f"Implement __hash__ to define the object's hash value, which should be consistent with equality (__eq__)."
         )
 
-        original_hash = cls.__hash__
+        # The hash_taken flag, cached hash and debug stack trace are all kept in the instance __dict__
+        if cls.__dictoffset__ == 0:
+            raise TypeError(f"@lazy_freeze requires '{cls.__name__}' instances to have a __dict__. "
+                            f"Add '__dict__' to its __slots__.")
 
-        # Core attribute mutation operations, always present via <object>
-        overridden_methods = {
-            '__setattr__': (object.__setattr__,
-                            lambda name, value: f"modify attribute '{name}' of"),
-            '__delattr__': (object.__delattr__,
-                            lambda name: f"delete attribute '{name}' from"),
-        }
+        # Converted once, so that checking an attribute name is a single set lookup
+        frozen_attrs = frozenset(freeze_attrs) if freeze_attrs else None
 
-        # Optional mutating operations, modified only if exist
-        optional_ops = {
-            '__setitem__': lambda key, value: f"modify item '{key}' of",
-            '__delitem__': lambda key: f"delete item '{key}' from",
-            '__iadd__': lambda other: "modify with in-place addition",
-            '__isub__': lambda other: "modify with in-place subtraction",
-            '__imul__': lambda other: "modify with in-place multiplication",
-            '__itruediv__': lambda other: "modify with in-place division",
-            '__ifloordiv__': lambda other: "modify with in-place floor division",
-            '__imod__': lambda other: "modify with in-place modulo",
-            '__ipow__': lambda other: "modify with in-place power",
-            '__ilshift__': lambda other: "modify with in-place left shift",
-            '__irshift__': lambda other: "modify with in-place right shift",
-            '__iand__': lambda other: "modify with in-place bitwise AND",
-            '__ixor__': lambda other: "modify with in-place bitwise XOR",
-            '__ior__': lambda other: "modify with in-place bitwise OR",
-
-            # numpy-specific (operator '@'), but added for completeness
-            '__imatmul__': lambda other: "modify with in-place matrix multiplication",
+        # Attribute methods always resolve, through <object> if nowhere else
+        overridden_methods: dict[str, Callable[..., Any]] = {
+            '__setattr__': _make_setattr_guard(cls.__setattr__, frozen_attrs),
+            '__delattr__': _make_delattr_guard(cls.__delattr__, frozen_attrs),
         }
 
-        # Only add optional operations that exist in the class
-        for op_name, error_formatter in optional_ops.items():
-            if hasattr(cls, op_name):
-                original_method = getattr(cls, op_name)
-                overridden_methods[op_name] = (original_method, error_formatter)
+        # Only protect optional operations the class supports, own or inherited. <object> defines none of them.
+        if (original_setitem := getattr(cls, '__setitem__', None)) is not None:
+            overridden_methods['__setitem__'] = _make_setitem_guard(original_setitem)
+            overridden_methods['__reduce_ex__'] = _make_reduce_ex(cls.__reduce_ex__)
+        if (original_delitem := getattr(cls, '__delitem__', None)) is not None:
+            overridden_methods['__delitem__'] = _make_delitem_guard(original_delitem)
+        overridden_methods.update({op_name: _make_inplace_guard(original_method, operation)
+                                   for op_name, operation in _INPLACE_OPS.items()
+                                   if (original_method := getattr(cls, op_name, None)) is not None})
+
+        # Copies and unpickled objects are rebuilt through setattr by a custom __setstate__, so restore them first
+        overridden_methods['__setstate__'] = _make_setstate(getattr(cls, '__setstate__', None))
 
-        # Update core methods if the class has its own implementations
-        for method_name in list(overridden_methods.keys()):
-            if method_name in ('__setattr__', '__delattr__') and hasattr(cls, method_name):
-                overridden_methods[method_name] = (getattr(cls, method_name),
-                                                   overridden_methods[method_name][1])
+        def new_hash(self: T, *, _original_hash: Callable[[Any], int] = original_hash) -> int:
+            """Return the cached hash, or calculate it and freeze the object. In debug mode, capture stack trace."""
+            instance_dict = self.__dict__
+            cached = instance_dict.get(_HASH_CACHE_ATTR)
+            if cached is not None:
+                return cached
 
-        def new_hash(self: T) -> int:
-            """Calculate hash and mark the object as hash-taken. In debug mode, capture stack trace."""
-            hash_value = original_hash(self)
+            hash_value = _original_hash(self)
 
-            # Use direct attribute setting to avoid recursion with cls.__setattr__
-            object.__setattr__(self, 'hash_taken', True)
+            # Store state directly, bypassing cls.__setattr__. The hash can't change once the object is frozen.
+            instance_dict[_HASH_CACHE_ATTR] = hash_value
+            instance_dict['hash_taken'] = True
 
             if debug:
-                stack_trace = ''.join(traceback.format_stack()[:-1])  # Exclude current frame
-                object.__setattr__(self, '_hash_stack_trace', stack_trace)
+                instance_dict['_hash_stack_trace'] = _HashStackTrace(sys._getframe(1))  # Exclude current frame
 
             return hash_value
 
-        def get_error_message(self: Any, operation: str) -> str:
-            if debug and hasattr(self, '_hash_stack_trace'):
-                return (
-                    f"Cannot {operation} {cls.__name__} after its hash has been taken.\n"
-                    f"Hash was calculated at:\n{self._hash_stack_trace}"
-                )
-            else:
-                return f"Cannot {operation} {cls.__name__} after its hash has been taken"
-
         cls.__hash__ = new_hash
+        # A class-level default, so that reading the flag never fails
+        cls.hash_taken = False  # type: ignore[attr-defined]
+        setattr(cls, _DEBUG_ATTR, debug)
 
-        # Create new methods for each mutating operation
-        for method_name, (original_method, error_formatter) in overridden_methods.items():
-            # Skip if the original method doesn't exist and it's not a core attribute method
-            if original_method is None and method_name not in ('__setattr__', '__delattr__'):
-                continue
-
-            # Create a wrapped method that checks hash_taken
-            def make_protected_method(method_name=method_name,
-                                      original=original_method,
-                                      format_error=error_formatter):
-                def protected_method(self: Any, *args: Any, **kwargs: Any) -> Any:
-                    if hasattr(self, 'hash_taken') and self.hash_taken:
-                        # Check if we're only protecting specific attributes
-                        if freeze_attrs:
-                            # For __setattr__ and __delattr__, check if the attribute is protected
-                            if method_name == '__setattr__' or method_name == '__delattr__':
-                                attr_name = args[0] if args else None
-                                if attr_name not in freeze_attrs:
-                                    return original(self, *args, **kwargs)
-
-                        # Generate the appropriate error message
-                        op_msg = format_error(*args)
-                        raise TypeError(get_error_message(self, op_msg))
-
-                    return original(self, *args, **kwargs)
-
-                return protected_method
-
-            # Set the method on the class
-            setattr(cls, method_name, make_protected_method())
+        for method_name, method in overridden_methods.items():
+            setattr(cls, method_name, method)
 
         return cls
 
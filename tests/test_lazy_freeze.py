@@ -1,9 +1,25 @@
 
 from __future__ import annotations
+import copy
+import dataclasses
+import pickle
 import unittest
 from lazy_freeze import lazy_freeze
 
 
+# Defined at module level so that instances can be pickled
+@lazy_freeze
+class PickledPerson:
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    def __hash__(self) -> int:
+        return hash(self.name)
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, PickledPerson) and self.name == other.name
+
+
 class TestLazyFreeze(unittest.TestCase):
     """Test cases for the lazy_freeze decorator."""
 
@@ -60,6 +76,25 @@ class TestLazyFreeze(unittest.TestCase):
             # Error message should contain stack trace
             self.assertIn("Hash was calculated at:", str(e))
 
+    def test_non_debug_error_ignores_getattr(self):
+        """Test that a class decorated without debug reports no stack trace and never consults __getattr__."""
+        @lazy_freeze
+        class Record:
+            def __init__(self, fields: dict[str, object]) -> None:
+                self.fields = fields
+
+            def __getattr__(self, name: str) -> object:
+                return self.__dict__['fields'][name]
+
+            def __hash__(self) -> int:
+                return hash(tuple(self.fields))
+
+        r = Record({'a': 1})
+        hash(r)
+        with self.assertRaises(TypeError) as context:
+            r.a = 2
+        self.assertNotIn("Hash was calculated at:", str(context.exception))
+
     def test_deletion_protection(self):
         """Test that attribute and item deletion are prevented after hash."""
         @lazy_freeze
@@ -147,6 +182,20 @@ class TestLazyFreeze(unittest.TestCase):
         self.assertIn("@lazy_freeze can only be applied to classes", error_message)
         self.assertIn("is of type 'int'", error_message)
 
+    def test_missing_hash(self):
+        """Test that classes without a custom __hash__ are rejected."""
+        with self.assertRaises(AssertionError):
+            @lazy_freeze
+            class NoHash:
+                pass
+
+        # Defining __eq__ without __hash__ sets __hash__ to None
+        with self.assertRaises(AssertionError):
+            @lazy_freeze
+            class Unhashable:
+                def __eq__(self, other: object) -> bool:
+                    return self is other
+
     def test_freeze_attributes(self):
         """Test that only specified attributes are frozen when using freeze_attrs."""
         @lazy_freeze(freeze_attrs=["name", "age"])
@@ -181,6 +230,182 @@ class TestLazyFreeze(unittest.TestCase):
         p.description = "Senior Software Engineer"
         self.assertEqual(p.description, "Senior Software Engineer")
 
+    def test_dataclass(self):
+        """Test that dataclass methods still work on a decorated dataclass after its hash is taken."""
+        @lazy_freeze
+        @dataclasses.dataclass(unsafe_hash=True)
+        class Point:
+            x: int
+            y: int
+
+        p = Point(1, 2)
+        h = hash(p)
+
+        self.assertEqual(p, Point(1, 2))
+        self.assertEqual(repr(p), repr(Point(1, 2)))
+        self.assertEqual(dataclasses.replace(p, y=3), Point(1, 3))
+
+    def test_subclass_of_decorated_class(self):
+        """Test that subclasses keep their own methods, are frozen after hash and are named in errors."""
+        @lazy_freeze
+        class Base:
+            def __init__(self, value: int) -> None:
+                self.value = value
+
+            def __hash__(self) -> int:
+                return hash(self.value)
+
+        class Derived(Base):
+            def describe(self) -> str:
+                return f"Derived({self.value})"
+
+        d = Derived(1)
+        d.value = 2
+        h = hash(d)
+
+        self.assertEqual(d.describe(), "Derived(2)")
+        self.assertEqual(hash(d), h)
+
+        with self.assertRaises(TypeError) as context:
+            d.value = 3
+        self.assertIn("Derived", str(context.exception))
+
+    def test_slotted_class(self):
+        """Test that classes without an instance __dict__ are rejected, since the flag is kept there."""
+        with self.assertRaises(TypeError):
+            @lazy_freeze
+            class Point:
+                __slots__ = ('x', 'y')
+
+                def __hash__(self) -> int:
+                    return hash((self.x, self.y))
+
+        @lazy_freeze
+        class DictPoint:
+            __slots__ = ('x', '__dict__')
+
+            def __init__(self, x: int) -> None:
+                self.x = x
+
+            def __hash__(self) -> int:
+                return hash(self.x)
+
+        p = DictPoint(1)
+        hash(p)
+        with self.assertRaises(TypeError):
+            p.x = 2
+
+    def test_hash_is_cached(self):
+        """Test that the original __hash__ runs only once per frozen object."""
+        calls: list[int] = []
+
+        @lazy_freeze
+        class Person:
+            def __init__(self, name: str) -> None:
+                self.name = name
+
+            def __hash__(self) -> int:
+                calls.append(1)
+                return hash(self.name)
+
+        p = Person("Alice")
+        h = hash(p)
+        self.assertEqual(hash(p), h)
+        self.assertEqual({p: 1}[p], 1)
+        self.assertEqual(len(calls), 1)
+
+    def test_user_hash_memo_is_kept(self):
+        """Test that the decorator's hash cache does not clash with a memo kept by the class itself."""
+        @lazy_freeze
+        class Memo:
+            def __init__(self, value: int) -> None:
+                self.value = value
+                self._cached_hash: int | None = None
+
+            def __hash__(self) -> int:
+                if self._cached_hash is None:
+                    self._cached_hash = hash(self.value)
+                return self._cached_hash  # type: ignore[return-value]
+
+        m = Memo(5)
+        self.assertEqual(hash(m), hash(5))
+        self.assertEqual(m._cached_hash, hash(5))
+
+    def test_pickle_and_copy(self):
+        """Test that copied and unpickled objects stay frozen, but calculate their own hash."""
+        p = PickledPerson("Alice")
+        h = hash(p)
+
+        restored = pickle.loads(pickle.dumps(p))
+        self.assertEqual(restored, p)
+        self.assertEqual(hash(restored), h)
+        with self.assertRaises(TypeError):
+            restored.name = "Bob"
+
+        p_copy = copy.copy(p)
+        self.assertEqual(p_copy, p)
+        with self.assertRaises(TypeError):
+            p_copy.name = "Bob"
+
+        @lazy_freeze
+        class Key:
+            def __init__(self, name: str, owner: object) -> None:
+                self.name = name
+                self.owner = owner
+
+            def __hash__(self) -> int:
+                return hash((self.name, self.owner))
+
+            def __eq__(self, other: object) -> bool:
+                return isinstance(other, Key) and (self.name, self.owner) == (other.name, other.owner)
+
+        # A deep copy holds a new owner, so its hash must not be the one cached by the original
+        k = Key('a', object())
+        hash(k)
+        k_copy = copy.deepcopy(k)
+        twin = Key('a', k_copy.owner)
+        self.assertEqual(k_copy, twin)
+        self.assertEqual({k_copy: 1}.get(twin), 1)
+
+    def test_copy_with_custom_setstate(self):
+        """Test that a class restoring its state with plain assignments can be copied once hashed."""
+        @lazy_freeze
+        class Stateful:
+            def __init__(self, n: int) -> None:
+                self.n = n
+
+            def __hash__(self) -> int:
+                return hash(self.n)
+
+            def __eq__(self, other: object) -> bool:
+                return isinstance(other, Stateful) and self.n == other.n
+
+            def __setstate__(self, state: dict[str, int]) -> None:
+                self.n = state['n']
+
+        s = Stateful(1)
+        hash(s)
+        for s_copy in (copy.copy(s), copy.deepcopy(s)):
+            self.assertEqual(s_copy, s)
+            with self.assertRaises(TypeError):
+                s_copy.n = 2
+
+    def test_copy_dict_subclass(self):
+        """Test that a frozen dict subclass is copied with its items, and stays frozen."""
+        @lazy_freeze
+        class Config(dict):
+            def __hash__(self) -> int:  # type: ignore
+                return hash(tuple(sorted(self.items())))
+
+        c = Config(a=1)
+        c.name = "config"
+        hash(c)
+        for c_copy in (copy.copy(c), copy.deepcopy(c)):
+            self.assertEqual(c_copy, c)
+            self.assertEqual(c_copy.name, "config")
+            with self.assertRaises(TypeError):
+                c_copy['a'] = 2
+
 
 if __name__ == '__main__':
     unittest.main()